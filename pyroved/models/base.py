@@ -7,15 +7,16 @@ Variational encoder-decoder base class
 Created by Maxim Ziatdinov (email: ziatdinovmax@gmail.com)
 """
 
-from typing import Tuple, Type, Union, List
+from typing import Dict, Tuple, Type, Union, List
 from abc import abstractmethod
+from copy import deepcopy
+from itertools import accumulate
+from warnings import warn
 
 import torch
 import torch.nn as nn
 
-from ..utils import init_dataloader, transform_coordinates, generate_grid, _to_device
-
-tt = torch.tensor
+from ..utils import transform_coordinates, generate_grid
 
 
 class baseVAE(nn.Module):
@@ -52,6 +53,8 @@ class baseVAE(nn.Module):
             "device", 'cuda' if torch.cuda.is_available() else 'cpu')
         # Set dimensionality
         self.ndim = len(data_dim)
+        # Flattened data size (fixed for a given model, so we compute it once)
+        self._reshape = torch.prod(torch.as_tensor(data_dim)).item()
         # Set invariances to enforce (number and type)
         if invariances is None:
             coord = 0
@@ -66,21 +69,40 @@ class baseVAE(nn.Module):
                 coord = coord + 1
         self.coord = coord
         self.invariances = invariances
-        # Set coordiante grid
+        # Latent vector parts associated with coordinate transformations
+        # (in the order they are stored) and their boundaries
+        self._split_parts, self._split_idx = [], []
+        if self.coord > 0:
+            part_dims = {'r': 1, 't': self.ndim, 's': 1}
+            self._split_parts = [k for k in 'rts' if k in invariances]
+            self._split_idx = list(
+                accumulate(part_dims[k] for k in self._split_parts))
+        # Set coordiante grid. The grid and the priors below are registered
+        # as (non-persistent) buffers so that they follow the module's device
         if self.coord > 0:
-            self.grid = generate_grid(data_dim).to(self.device)
+            self.register_buffer(
+                "grid", generate_grid(data_dim).to(self.device),
+                persistent=False)
+        # Parameters of the latent prior p(z) for a batch size (see _latent_prior)
+        self._prior_cache: Dict[Tuple, Tuple[torch.Tensor]] = {}
         # Prior "belief" about the degree of translational disorder
         if self.coord > 0 and 't' in self.invariances:
-            dx_pri = tt(kwargs.get("dx_prior", 0.1))
-            dy_pri = kwargs.get("dy_prior", dx_pri.clone())
-            self.t_prior = (tt([dx_pri, dy_pri]) if self.ndim == 2
-                            else dx_pri).to(self.device)
+            dx_pri = torch.as_tensor(kwargs.get("dx_prior", 0.1))
+            dy_pri = torch.as_tensor(kwargs.get("dy_prior", dx_pri))
+            t_prior = torch.stack([dx_pri, dy_pri]) if self.ndim == 2 else dx_pri
+            self.register_buffer(
+                "t_prior", t_prior.to(self.device), persistent=False)
         # Prior "belief" about the degree of scale disorder
         if self.coord > 0 and 's' in self.invariances:
-            self.sc_prior = tt(kwargs.get("sc_prior", 0.1)).to(self.device)
+            sc_prior = torch.as_tensor(kwargs.get("sc_prior", 0.1))
+            self.register_buffer(
+                "sc_prior", sc_prior.to(self.device), persistent=False)
         # Encoder and decoder (None by default)
         self.encoder_z = None
         self.decoder = None
+        # Frozen inference-only copy of the decoder (see freeze_decoder)
+        self._frozen_decoder = None
+        self._frozen_version = None
 
     @abstractmethod
     def model(self, *args, **kwargs):
@@ -99,77 +121,146 @@ class baseVAE(nn.Module):
         Split latent vector into parts associated with
         coordinate transformations and image content
         """
-        # For 1D, there is only a translation
-        if self.ndim == 1:
-            dx = z[:, 0:1]
-            z = z[:, 1:]
-            return None, dx, None, z
-        phi = tt(0).to(self.device)
-        dx = tt(0).to(self.device)
-        sc = tt(1).to(self.device)
-        if 'r' in self.invariances:
-            phi = z[:, 0]
-            z = z[:, 1:]
-        if 't' in self.invariances:
-            dx = z[:, :2]
-            z = z[:, 2:]
-        if 's' in self.invariances:
-            sc = sc + self.sc_prior * z[:, 0]
-            z = z[:, 1:]
+        # Split into all parts at once (the last one is image content)
+        *parts, z = z.tensor_split(self._split_idx, dim=1)
+        parts = dict(zip(self._split_parts, parts))
+        # Parts for transformations that are not enforced are set to None
+        # (for 1D, there is only a translation)
+        phi, dx, sc = parts.get('r'), parts.get('t'), parts.get('s')
+        if phi is not None:
+            phi = phi[:, 0]
+        if sc is not None:
+            sc = 1 + self.sc_prior * sc[:, 0]
         return phi, dx, sc, z
 
+    def _latent_prior(self, x: torch.Tensor) -> Tuple[torch.Tensor]:
+        """
+        Returns location and scale of the standard normal prior p(z)
+        for a batch of data x. These are constant tensors, so they are
+        cached per batch size (and dtype and device) and reused.
+        """
+        key = (x.shape[0], x.dtype, x.device)
+        prior = self._prior_cache.get(key)
+        if prior is None:
+            z_loc = x.new_zeros(torch.Size((x.shape[0], self.z_dim)))
+            prior = (z_loc, torch.ones_like(z_loc))
+            self._prior_cache[key] = prior
+        return prior
+
+    def _apply(self, fn, *args, **kwargs):
+        # Cached tensors would otherwise stay on the old device/dtype
+        self._prior_cache.clear()
+        self._frozen_decoder = None
+        return super(baseVAE, self)._apply(fn, *args, **kwargs)
+
     def _encode(
         self,
         *input_args: Tuple[Union[torch.Tensor, List[torch.Tensor]]],
         device: str = None,
         **kwargs: int
-    ) -> torch.Tensor:
+    ) -> Tuple[torch.Tensor]:
         """Encodes data using a trained inference (encoder) network
-        in a batch-by-batch fashion."""
+        in a batch-by-batch fashion. Returns a tuple with the encoder's
+        outputs (e.g. means and standard deviations) for all the data."""
 
         device = self.device if device is None else device
+        batch_size = kwargs.get("batch_size", 100)
+        num_samples = len(input_args[0])
+        # Page-locked host memory allows for asynchronous device-to-host copies
+        pin_memory = torch.device(device).type == "cuda"
 
-        def inference(x: Tuple[torch.Tensor]) -> torch.Tensor:
-            x = _to_device(x)
-            with torch.no_grad():
+        z_encoded = None
+        for i in range(0, num_samples, batch_size):
+            x = [a[i:i+batch_size].to(device, non_blocking=True)
+                 for a in input_args]
+            x = x[0] if len(x) == 1 else x
+            with torch.inference_mode():
                 encoded = self.encoder_z(x)
-            encoded = torch.cat(encoded, -1).cpu()
-            return encoded
-
-        loader = init_dataloader(*input_args, shuffle=False, **kwargs)
-        z_encoded = []
-        for x in loader:
-            z_encoded.append(inference(x))
-        return torch.cat(z_encoded)
+            # The outputs are allocated outside of the inference mode, so that
+            # they can be modified in place or used in autograd afterwards
+            if z_encoded is None:
+                z_encoded = [torch.empty(
+                    num_samples, *e.shape[1:], dtype=e.dtype,
+                    pin_memory=pin_memory) for e in encoded]
+            for z_i, e in zip(z_encoded, encoded):
+                z_i[i:i+batch_size].copy_(e, non_blocking=True)
+        if pin_memory:
+            torch.cuda.synchronize(device)
+        return tuple(z_encoded)
 
     def _decode(self, z_new: torch.Tensor, device: str = None,
                 **kwargs: int) -> torch.Tensor:
         """Decodes latent coordinates in a batch-by-batch fashion."""
-        
-        device = self.device if device is None else device
 
-        def generator(z: List[torch.Tensor]) -> torch.Tensor:
-            with torch.no_grad():
-                loc = self.decoder(*z)
-            return loc.cpu()
+        device = self.device if device is None else device
+        batch_size = kwargs.get("batch_size", 100)
 
-        z_new = init_dataloader(z_new, shuffle=False, **kwargs)
+        grid = None
         if self.invariances:
-            grid = self.grid
-            a = kwargs.get("angle", tt(0.)).to(device)
-            t = kwargs.get("shift", tt(0.)).to(device)
-            s = kwargs.get("scale", tt(1.)).to(device)
-            grid = transform_coordinates(
-                grid.unsqueeze(0), a.unsqueeze(0),
-                t.unsqueeze(0), s.unsqueeze(0))
-            grid = grid.squeeze()
+            # Optionally condition a generative model on specific
+            # rotation angle, translation and/or scale
+            transforms = [kwargs.get(k) for k in ("angle", "shift", "scale")]
+            transforms = [None if t is None else
+                          torch.as_tensor(t, device=device).unsqueeze(0)
+                          for t in transforms]
+            grid = transform_coordinates(self.grid.unsqueeze(0), *transforms)
+            grid = grid.squeeze(0)
+
+        # Decoders may return flattened outputs (with the first dimension
+        # not equal to batch size), so the batches are concatenated at the end
         x_decoded = []
-        for z in z_new:
-            if self.invariances:
-                z = [grid.expand(z[0].shape[0], *grid.shape)] + z
-            x_decoded.append(generator(z))
+        with torch.inference_mode():
+            for z in z_new.split(batch_size):
+                z = [z.to(device)]
+                if grid is not None:
+                    z = [grid.expand(z[0].shape[0], *grid.shape)] + z
+                x_decoded.append(self._inference_decoder(*z).cpu())
         return torch.cat(x_decoded)
 
+    @property
+    def _inference_decoder(self) -> nn.Module:
+        """Decoder used for generating outputs from latent vectors"""
+        if self._frozen_decoder is not None:
+            if self._decoder_version() == self._frozen_version:
+                return self._frozen_decoder
+            # The trainable decoder was updated (e.g. trained further)
+            # after the frozen copy had been built
+            warn("Decoder weights have changed since freeze_decoder() was " +
+                 "called; using the trainable decoder instead. Call " +
+                 "freeze_decoder() again to rebuild the frozen copy",
+                 category=UserWarning)
+            self._frozen_decoder = None
+        return self.decoder
+
+    def _decoder_version(self) -> Tuple[int]:
+        """Version counters of the decoder parameters (incremented
+        by every in-place update, such as an optimizer step)"""
+        return tuple(p._version for p in self.decoder.parameters())
+
+    def freeze_decoder(self) -> None:
+        """
+        Builds an inference-only copy of the decoder with frozen weights,
+        which is then used for decoding latent vectors (e.g. in manifold2d).
+        The copy is compiled with torch.compile (PyTorch>=2.2) or scripted
+        and frozen with TorchScript on the older PyTorch versions. Decoders
+        that cannot be scripted are used as is. The copy is discarded (with
+        a warning) once the weights of the trainable decoder are updated.
+        """
+        decoder = deepcopy(self.decoder).eval().requires_grad_(False)
+        if hasattr(torch.nn.Module, "compile"):
+            decoder.compile(dynamic=True)
+        else:
+            try:
+                decoder = torch.jit.freeze(torch.jit.script(decoder))
+            except (RuntimeError, torch.jit.frontend.NotSupportedError) as e:
+                warn("Decoder could not be scripted with TorchScript " +
+                     "({}); using its unscripted copy".format(e),
+                     category=UserWarning)
+        # Bypass nn.Module.__setattr__ so that the copy is not registered
+        # as a submodule (its weights are not a part of the state dict)
+        object.__setattr__(self, "_frozen_decoder", decoder)
+        self._frozen_version = self._decoder_version()
+
     def set_encoder(self, encoder_net: Type[torch.nn.Module]) -> None:
         """Sets a user-defined encoder neural network."""
 
@@ -179,6 +270,7 @@ class baseVAE(nn.Module):
         """Sets a user-defined decoder neural network."""
 
         self.decoder = decoder_net.to(self.device)
+        self._frozen_decoder = None
 
     def save_weights(self, filepath: str) -> None:
         """Saves trained weights of encoder(s) and decoder."""
@@ -190,3 +282,4 @@ class baseVAE(nn.Module):
 
         weights = torch.load(filepath, map_location=self.device)
         self.load_state_dict(weights)
+        self._frozen_decoder = None
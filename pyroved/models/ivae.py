@@ -8,7 +8,7 @@ rotation, translation, and scale
 Created by Maxim Ziatdinov (email: ziatdinovmax@gmail.com)
 """
 
-from typing import Optional, Tuple, Union, List
+from typing import Optional, Tuple, Type, Union, List
 
 import pyro
 import pyro.distributions as dist
@@ -17,7 +17,7 @@ import torch
 from pyroved.models.base import baseVAE
 from pyroved.nets import fcDecoderNet, fcEncoderNet, sDecoderNet
 from pyroved.utils import (
-    generate_grid, generate_latent_grid, get_sampler,
+    affine_grid_coordinates, generate_grid, generate_latent_grid, get_sampler,
     plot_img_grid, plot_spect_grid, set_deterministic_mode,
     to_onehot, transform_coordinates, generate_latent_grid_traversal, 
     plot_grid_traversal
@@ -66,6 +66,10 @@ class iVAE(baseVAE):
             and 'gaussian'. (The default is "bernoulli").
         sigmoid_d:
             Sigmoid activation for the decoder output. (The default is True).
+            With the 'bernoulli' sampler, the sigmoid is folded into
+            the likelihood computation during training and is applied
+            to the decoded outputs only. In this case, the decoder
+            attribute (self.decoder) outputs logits, not probabilities.
         seed:
             Seed used in torch.manual_seed(seed) and
             torch.cuda.manual_seed_all(seed). (The default is 1).
@@ -82,6 +86,19 @@ class iVAE(baseVAE):
             Scale prior (usually, sc_prior << 1)
         decoder_sig:
             Sets sigma for a "gaussian" decoder sampler
+        scale_factor:
+            Default scale factor for KL divergence. It is used when no
+            scale_factor is passed to the model/guide (e.g. via trainer.step).
+            Setting a constant factor here rather than at every step keeps
+            the inputs to a JIT-compiled ELBO unchanged. (The default is 1)
+        compile:
+            Compiles the coordinate transformation, encoder and decoder
+            with torch.compile (requires PyTorch>=2.2). (The default is False)
+        autocast:
+            Runs the encoder and decoder in mixed precision with torch.autocast
+            (float16 on GPU, bfloat16 on CPU). The coordinate grid and priors
+            stay in full precision. Note that the SVI trainers do not apply
+            gradient scaling. (The default is False)
 
     Examples:
         Example 1. Initialize and train a VAE model with rotational invariance
@@ -147,23 +164,53 @@ class iVAE(baseVAE):
             data_dim, latent_dim + self.coord, c_dim, hidden_dim_e,
             activation, softplus_out=True
         )
+        # For the Bernoulli sampler, the decoder's sigmoid is fused into
+        # the likelihood, i.e. the decoder outputs logits during training
+        self._fuse_sigmoid = sampler_d == "bernoulli" and sigmoid_d
         # Initialize the decoder network
         dnet = sDecoderNet if 0 < self.coord < 5 else fcDecoderNet
         self.decoder = dnet(
             data_dim, latent_dim, c_dim, hidden_dim_d,
-            activation, sigmoid_out=sigmoid_d
+            activation, sigmoid_out=sigmoid_d and not self._fuse_sigmoid
         )
         # Initialize the decoder's sampler
-        self.sampler_d = get_sampler(sampler_d, **kwargs)
+        self._logits_d = self._outputs_logits(self.decoder)
+        self.sampler_d = get_sampler(
+            "bernoulli_logits" if self._logits_d else sampler_d, **kwargs)
 
         # Sets continuous and discrete dimensions
         self.z_dim = latent_dim + self.coord
         self.c_dim = c_dim
         self.num_classes = c_dim
 
+        # Default KL scale factor
+        self._beta = kwargs.get("scale_factor", 1.)
+
+        # Mixed precision for the encoder and decoder forward passes
+        self._autocast = kwargs.get("autocast", False)
+
+        # Optionally compile the coordinate transformation and the networks
+        if kwargs.get("compile", False):
+            self._compile()
+
         # Move model parameters to appropriate device
         self.to(self.device)
 
+    def _compile(self) -> None:
+        """
+        Compiles the coordinate transformation, encoder and decoder
+        with torch.compile (requires PyTorch>=2.2)
+        """
+        if not hasattr(torch.nn.Module, "compile"):
+            raise RuntimeError(
+                "Model compilation requires PyTorch 2.2 or higher")
+        if self.coord > 0:
+            self._coord_branch = torch.compile(
+                self._coord_branch, dynamic=False)
+        # Compile in place, so that the parameter names remain unchanged
+        self.encoder_z.compile(dynamic=False)
+        self.decoder.compile(dynamic=False)
+
     def model(self,
               x: torch.Tensor,
               y: Optional[torch.Tensor] = None,
@@ -174,34 +221,29 @@ class iVAE(baseVAE):
         # register PyTorch module `decoder` with Pyro
         pyro.module("decoder", self.decoder)
         # KLD scale factor (see e.g. https://openreview.net/pdf?id=Sy2fzU9gl)
-        beta = kwargs.get("scale_factor", 1.)
-        reshape_ = torch.prod(torch.tensor(x.shape[1:])).item()
+        beta = kwargs.get("scale_factor", self._beta)
         with pyro.plate("data", x.shape[0]):
             # setup hyperparameters for prior p(z)
-            z_loc = x.new_zeros(torch.Size((x.shape[0], self.z_dim)))
-            z_scale = x.new_ones(torch.Size((x.shape[0], self.z_dim)))
+            z_loc, z_scale = self._latent_prior(x)
             # sample from prior (value will be sampled by guide when computing the ELBO)
             with pyro.poutine.scale(scale=beta):
                 z = pyro.sample("latent", dist.Normal(z_loc, z_scale).to_event(1))
             if self.coord > 0:  # rotationally- and/or translationaly-invariant mode
-                # Split latent variable into parts for rotation
-                # and/or translation and image content
-                phi, dx, sc, z = self.split_latent(z)
-                if 't' in self.invariances:
-                    dx = (dx * self.t_prior).unsqueeze(1)
-                # transform coordinate grid
-                grid = self.grid.expand(x.shape[0], *self.grid.shape)
-                x_coord_prime = transform_coordinates(grid, phi, dx, sc)
+                # Split latent variable into parts for rotation and/or
+                # translation and image content and transform coordinate grid
+                x_coord_prime, z = self._coord_branch(z, x.shape[0])
             # Add class label (if any)
             if y is not None:
                 z = torch.cat([z, y], dim=-1)
             # decode the latent code z together with the transformed coordinates (if any)
             dec_args = (x_coord_prime, z) if self.coord else (z,)
-            loc = self.decoder(*dec_args)
+            with torch.autocast(x.device.type, enabled=self._autocast):
+                loc = self.decoder(*dec_args)
+            loc = loc.to(x.dtype)
             # score against actual images ("binary cross-entropy loss")
             pyro.sample(
-                "obs", self.sampler_d(loc.view(-1, reshape_)).to_event(1),
-                obs=x.view(-1, reshape_))
+                "obs", self.sampler_d(loc.reshape(-1, self._reshape)).to_event(1),
+                obs=x.reshape(-1, self._reshape))
 
     def guide(self,
               x: torch.Tensor,
@@ -213,15 +255,36 @@ class iVAE(baseVAE):
         # register PyTorch module `encoder_z` with Pyro
         pyro.module("encoder_z", self.encoder_z)
         # KLD scale factor (see e.g. https://openreview.net/pdf?id=Sy2fzU9gl)
-        beta = kwargs.get("scale_factor", 1.)
+        beta = kwargs.get("scale_factor", self._beta)
         with pyro.plate("data", x.shape[0]):
             # use the encoder to get the parameters used to define q(z|x)
             enc_args = [x, y] if y is not None else x
-            z_loc, z_scale = self.encoder_z(enc_args)
+            with torch.autocast(x.device.type, enabled=self._autocast):
+                z_loc, z_scale = self.encoder_z(enc_args)
+            z_loc, z_scale = z_loc.to(x.dtype), z_scale.to(x.dtype)
             # sample the latent code z
             with pyro.poutine.scale(scale=beta):
                 pyro.sample("latent", dist.Normal(z_loc, z_scale).to_event(1))
 
+    def _coord_branch(self,
+                      z: torch.Tensor,
+                      batch_dim: int) -> Tuple[torch.Tensor]:
+        """
+        Splits latent variable into parts associated with coordinate
+        transformations and image content, and returns the transformed
+        coordinate grid together with the image content part.
+        """
+        phi, dx, sc, z = self.split_latent(z)
+        if 't' in self.invariances:
+            dx = dx * self.t_prior
+        if self.ndim == 2:
+            x_coord_prime = affine_grid_coordinates(
+                self.data_dim, batch_dim, phi, dx, sc)
+        else:
+            x_coord_prime = transform_coordinates(
+                self.grid, phi, dx.unsqueeze(1))
+        return x_coord_prime, z
+
     def split_latent(self, z: torch.Tensor) -> Tuple[torch.Tensor]:
         """
         Split latent variable into parts associated with coordinate transformations
@@ -253,8 +316,7 @@ class iVAE(baseVAE):
                 Batch size as 'batch_size' (for encoding large volumes of data)
         """
         enc_args = [x_new, y] if y is not None else [x_new,]
-        z = self._encode(*enc_args, **kwargs)
-        z_loc, z_scale = z.split(self.z_dim, 1)
+        z_loc, z_scale = self._encode(*enc_args, **kwargs)
         return z_loc, z_scale
 
     def decode(self,
@@ -274,8 +336,33 @@ class iVAE(baseVAE):
         if y is not None:
             z = torch.cat([z, y.to(self.device)], -1)
         loc = self._decode(z, **kwargs)
+        if self._logits_d:
+            loc = torch.sigmoid(loc)
         return loc
 
+    def _outputs_logits(self, decoder_net: torch.nn.Module) -> bool:
+        """
+        Checks if the decoder outputs logits for the fused Bernoulli
+        likelihood, i.e. if it has no output activation (activation_out)
+        as the built-in decoders initialized with sigmoid_out=False
+        """
+        activation_out = getattr(decoder_net, "activation_out", None)
+        return (self._fuse_sigmoid and
+                isinstance(activation_out, torch.nn.Identity))
+
+    def set_decoder(self, decoder_net: Type[torch.nn.Module]) -> None:
+        """
+        Sets a user-defined decoder neural network. For the 'bernoulli'
+        sampler (with sigmoid_d=True), the decoder's output is treated as
+        logits if its output activation (activation_out) is nn.Identity
+        and as probabilities otherwise.
+        """
+        super(iVAE, self).set_decoder(decoder_net)
+        if self._fuse_sigmoid:
+            self._logits_d = self._outputs_logits(decoder_net)
+            self.sampler_d = get_sampler(
+                "bernoulli_logits" if self._logits_d else "bernoulli")
+
     def manifold2d(self, d: int,
                    y: torch.Tensor = None,
                    plot: bool = True,
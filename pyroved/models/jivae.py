@@ -18,11 +18,9 @@ from ..nets import fcDecoderNet, jfcEncoderNet, sDecoderNet
 from ..utils import (generate_grid, generate_latent_grid,
                      generate_latent_grid_traversal, get_sampler,
                      plot_grid_traversal, plot_img_grid, plot_spect_grid,
-                     set_deterministic_mode, to_onehot, transform_coordinates)
+                     set_deterministic_mode, transform_coordinates)
 from .base import baseVAE
 
-tt = torch.tensor
-
 
 class jiVAE(baseVAE):
     """
@@ -145,6 +143,8 @@ class jiVAE(baseVAE):
         # Set continuous and discrete dimensions
         self.z_dim = latent_dim + self.coord
         self.discrete_dim = discrete_dim
+        # Lookup table for one-hot encoding of discrete classes
+        self.register_buffer("_eye", torch.eye(discrete_dim), persistent=False)
 
         # Move model parameters to appropriate device
         self.to(self.device)
@@ -163,12 +163,10 @@ class jiVAE(baseVAE):
             beta = torch.tensor(beta)
         if beta.ndim == 0:
             beta = torch.tensor([beta, beta])
-        reshape_ = torch.prod(tt(x.shape[1:])).item()
         bdim = x.shape[0]
         with pyro.plate("data"):
             # sample the continuous latent vector from the constant prior distribution
-            z_loc = x.new_zeros(torch.Size((bdim, self.z_dim)))
-            z_scale = x.new_ones(torch.Size((bdim, self.z_dim)))
+            z_loc, z_scale = self._latent_prior(x)
             # sample discrete latent vector from the constant prior
             alpha = x.new_ones(torch.Size((bdim, self.discrete_dim))) / self.discrete_dim
             # sample from prior (value will be sampled by guide when computing ELBO)
@@ -183,18 +181,17 @@ class jiVAE(baseVAE):
                 if 't' in self.invariances:
                     dx = (dx * self.t_prior).unsqueeze(1)
                 # transform coordinate grid
-                grid = self.grid.expand(bdim*self.discrete_dim, *self.grid.shape)
-                x_coord_prime = transform_coordinates(grid, phi, dx, sc)
+                x_coord_prime = transform_coordinates(self.grid, phi, dx, sc)
             # Continuous and discrete latent variables for the decoder
             z = [z, z_disc.reshape(-1, self.discrete_dim) if self.coord > 0 else z_disc]
             # decode the latent code z together with the transformed coordinates (if any)
             dec_args = (x_coord_prime, z) if self.coord else (z,)
             loc = self.decoder(*dec_args)
             # score against actual images/spectra
-            loc = loc.view(*z_disc.shape[:-1], reshape_)
+            loc = loc.view(*z_disc.shape[:-1], self._reshape)
             pyro.sample(
                 "obs", self.sampler_d(loc).to_event(1),
-                obs=x.view(-1, reshape_))
+                obs=x.reshape(-1, self._reshape))
 
     def guide(self,
               x: torch.Tensor,
@@ -245,10 +242,7 @@ class jiVAE(baseVAE):
             kwargs:
                 Batch size as 'batch_size' (for encoding large volumes of data).
         """
-        z = self._encode(x_new)
-        z_loc = z[:, :self.z_dim]
-        z_scale = z[:, self.z_dim:2*self.z_dim]
-        classes = z[:, 2*self.z_dim:]
+        z_loc, z_scale, classes = self._encode(x_new, **kwargs)
         if not logits:
             _, classes = torch.max(classes, 1)
         return z_loc, z_scale, classes
@@ -280,7 +274,7 @@ class jiVAE(baseVAE):
                     and plot parameters ('padding', 'pad_value', 'cmap', 'origin', 'ylim')
         """
         z, (grid_x, grid_y) = generate_latent_grid(d, **kwargs)
-        z_disc = to_onehot(tt(disc_idx).unsqueeze(0), self.discrete_dim)
+        z_disc = self._eye[[disc_idx]]
         z_disc = z_disc.repeat(z.shape[0], 1)
         loc = self.decode(z, z_disc, **kwargs)
         if plot:
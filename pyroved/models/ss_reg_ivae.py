@@ -167,8 +167,7 @@ class ss_reg_iVAE(baseVAE):
         # pyro.plate enforces independence between variables in batches xs, ys
         with pyro.plate("data"):
             # sample the latent vector from the constant prior distribution
-            prior_loc = torch.zeros(batch_dim, self.z_dim, **specs)
-            prior_scale = torch.ones(batch_dim, self.z_dim, **specs)
+            prior_loc, prior_scale = self._latent_prior(xs)
             with pyro.poutine.scale(scale=beta):
                 zs = pyro.sample(
                     "z", dist.Normal(prior_loc, prior_scale).to_event(1))
@@ -179,8 +178,7 @@ class ss_reg_iVAE(baseVAE):
                 if 't' in self.invariances:
                     dx = (dx * self.t_prior).unsqueeze(1)
                 # transform coordinate grid
-                grid = self.grid.expand(zs.shape[0], *self.grid.shape)
-                x_coord_prime = transform_coordinates(grid, phi, dx, sc)
+                x_coord_prime = transform_coordinates(self.grid, phi, dx, sc)
             # sample label from the constant prior or observe the value
             c_prior = (torch.zeros(batch_dim, self.reg_dim, **specs))
             ys = pyro.sample(
@@ -267,7 +265,7 @@ class ss_reg_iVAE(baseVAE):
                 Batch size as 'batch_size' (for encoding large volumes of data)
         """
         def regress(x_i) -> torch.Tensor:
-            with torch.no_grad():
+            with torch.inference_mode():
                 predicted = self.encoder_y(x_i)
             return predicted.cpu()
 
@@ -299,8 +297,7 @@ class ss_reg_iVAE(baseVAE):
         """
         if y is None:
             y = self.regressor(x_new, **kwargs)
-        z = self._encode(x_new, y, **kwargs)
-        z_loc, z_scale = z.split(self.z_dim, 1)
+        z_loc, z_scale = self._encode(x_new, y, **kwargs)
         return z_loc, z_scale, y
 
     def decode(self, z: torch.Tensor, y: torch.Tensor, **kwargs: int) -> torch.Tensor:
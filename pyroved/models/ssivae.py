@@ -16,12 +16,10 @@ import torch
 from .base import baseVAE
 from ..nets import fcDecoderNet, fcEncoderNet, sDecoderNet, fcClassifierNet
 from ..utils import (get_sampler, plot_img_grid,
-                     plot_spect_grid, set_deterministic_mode, to_onehot,
+                     plot_spect_grid, set_deterministic_mode,
                      transform_coordinates, init_dataloader, generate_latent_grid,
                      generate_latent_grid_traversal, plot_grid_traversal)
 
-tt = torch.tensor
-
 
 class ssiVAE(baseVAE):
     """
@@ -146,6 +144,8 @@ class ssiVAE(baseVAE):
         # Sets continuous and discrete dimensions
         self.z_dim = latent_dim + self.coord
         self.num_classes = num_classes
+        # Lookup table for one-hot encoding of class labels
+        self.register_buffer("_eye", torch.eye(num_classes), persistent=False)
 
         # Send model parameters to their appropriate devices.
         self.to(self.device)
@@ -164,8 +164,7 @@ class ssiVAE(baseVAE):
         # pyro.plate enforces independence between variables in batches xs, ys
         with pyro.plate("data"):
             # sample the latent vector from the constant prior distribution
-            prior_loc = torch.zeros(batch_dim, self.z_dim, **specs)
-            prior_scale = torch.ones(batch_dim, self.z_dim, **specs)
+            prior_loc, prior_scale = self._latent_prior(xs)
             with pyro.poutine.scale(scale=beta):
                 zs = pyro.sample(
                     "z", dist.Normal(prior_loc, prior_scale).to_event(1))
@@ -176,14 +175,7 @@ class ssiVAE(baseVAE):
                 if 't' in self.invariances:
                     dx = (dx * self.t_prior).unsqueeze(1)
                 # transform coordinate grid
-                if 'r' in self.invariances:
-                    expdim = phi.shape[0]
-                elif 't' in self.invariances:
-                    expdim = dx.shape[0]
-                elif 's' in self.invariances:
-                    expdim = sc.shape[0]
-                grid = self.grid.expand(expdim, *self.grid.shape)
-                x_coord_prime = transform_coordinates(grid, phi, dx, sc)
+                x_coord_prime = transform_coordinates(self.grid, phi, dx, sc)
             # sample label from the constant prior or observe the value
             alpha_prior = (torch.ones(batch_dim, self.num_classes, **specs) /
                            self.num_classes)
@@ -268,7 +260,7 @@ class ssiVAE(baseVAE):
                 Batch size as 'batch_size' (for encoding large volumes of data)
         """
         def classify(x_i) -> torch.Tensor:
-            with torch.no_grad():
+            with torch.inference_mode():
                 alpha = self.encoder_y(x_i)
             _, predicted = torch.max(alpha.data, 1)
             return predicted.cpu()
@@ -300,11 +292,10 @@ class ssiVAE(baseVAE):
         if y is None:
             y = self.classifier(x_new, **kwargs)
         if y.ndim < 2:
-            y = to_onehot(y, self.num_classes)
-        z = self._encode(x_new, y, **kwargs)
-        z_loc, z_scale = z.split(self.z_dim, 1)
+            y = self._eye[y.long().to(self._eye.device)]
+        z_loc, z_scale = self._encode(x_new, y, **kwargs)
         _, y_pred = torch.max(y, 1)
-        return z_loc, z_scale, y_pred
+        return z_loc, z_scale, y_pred.cpu()
 
     def decode(self, z: torch.Tensor, y: torch.Tensor, **kwargs: int) -> torch.Tensor:
         """
@@ -334,9 +325,9 @@ class ssiVAE(baseVAE):
                     ('padding', 'padding_value', 'cmap', 'origin', 'ylim')
         """
         z, (grid_x, grid_y) = generate_latent_grid(d, **kwargs)
-        cls = tt(kwargs.get("label", 0))
+        cls = torch.as_tensor(kwargs.get("label", 0))
         if cls.ndim < 2:
-            cls = to_onehot(cls.unsqueeze(0), self.num_classes)
+            cls = self._eye[cls.long().view(-1).to(self._eye.device)]
         cls = cls.repeat(z.shape[0], 1)
         loc = self.decode(z, cls, **kwargs)
         if plot:
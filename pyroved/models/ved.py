@@ -132,8 +132,7 @@ class VED(baseVAE):
         beta = kwargs.get("scale_factor", 1.)
         with pyro.plate("data", x.shape[0]):
             # setup hyperparameters for prior p(z)
-            z_loc = x.new_zeros(torch.Size((x.shape[0], self.z_dim)))
-            z_scale = x.new_ones(torch.Size((x.shape[0], self.z_dim)))
+            z_loc, z_scale = self._latent_prior(x)
             # sample from prior (value will be sampled by guide when computing the ELBO)
             with pyro.poutine.scale(scale=beta):
                 z = pyro.sample("z", dist.Normal(z_loc, z_scale).to_event(1))
@@ -176,8 +175,7 @@ class VED(baseVAE):
                 Batch size as 'batch_size' (for encoding large volumes of data)
         """
         self.eval()
-        z = self._encode(x_new, **kwargs)
-        z_loc, z_scale = z.split(self.z_dim, 1)
+        z_loc, z_scale = self._encode(x_new, **kwargs)
         return z_loc, z_scale
 
     def decode(self,
@@ -199,12 +197,12 @@ class VED(baseVAE):
         """Forward prediction (encode -> sample -> decode)"""
 
         def forward_(x_i) -> torch.Tensor:
-            with torch.no_grad():
+            with torch.inference_mode():
                 encoded = self.encoder_z(x_i)
                 encoded = torch.cat(encoded, -1)
                 z_mu, z_sig = encoded.split(self.z_dim, 1)
                 z_samples = dist.Normal(z_mu, z_sig).rsample(sample_shape=(30,))
-                y = torch.cat([self.decoder(z)[None] for z in z_samples])
+                y = torch.cat([self._inference_decoder(z)[None] for z in z_samples])
             return y.mean(0).cpu(), y.std(0).cpu()
 
         x_new = init_dataloader(x_new, shuffle=False, **kwargs)
@@ -231,7 +229,7 @@ class VED(baseVAE):
         z, (grid_x, grid_y) = generate_latent_grid(d, **kwargs)
         z = z.to(self.device)
         with torch.no_grad():
-            loc = self.decoder(z).cpu()
+            loc = self._inference_decoder(z).cpu()
         if plot:
             if self.ndim == 2:
                 plot_img_grid(
@@ -18,8 +18,6 @@ from warnings import warn, filterwarnings
 
 filterwarnings("ignore", module="torch.nn.functional")
 
-tt = torch.tensor
-
 
 class convEncoderNet(nn.Module):
     """
@@ -42,7 +40,8 @@ class convEncoderNet(nn.Module):
         if hidden_dim is None:
             hidden_dim = [(32,), (64, 64), (128, 128)]
         dim_denom = 2**len(hidden_dim) if pool_last else 2**(len(hidden_dim) - 1)
-        output_dim = torch.div(tt(input_dim), dim_denom).int().tolist()
+        output_dim = torch.div(
+            torch.as_tensor(input_dim), dim_denom).int().tolist()
         output_channels = hidden_dim[-1][-1]
         self.latent_dim = latent_dim
         self.feature_extractor = FeatureExtractor(
@@ -51,7 +50,7 @@ class convEncoderNet(nn.Module):
             pool_last=pool_last)
         self.features2latent = features_to_latent(
             [output_channels, *output_dim], 2*latent_dim)
-        self.activation_out = nn.Softplus() if softplus_out else lambda x: x
+        self.activation_out = nn.Softplus() if softplus_out else nn.Identity()
 
     def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor]:
         """
@@ -84,14 +83,15 @@ class convDecoderNet(nn.Module):
         super(convDecoderNet, self).__init__()
         if hidden_dim is None:
             hidden_dim = [(128, 128), (64, 64), (32,)]
-        input_dim = torch.div(tt(output_dim), 2**len(hidden_dim)).int().tolist()
+        input_dim = torch.div(
+            torch.as_tensor(output_dim), 2**len(hidden_dim)).int().tolist()
         self.latent2features = latent_to_features(
             latent_dim, [hidden_dim[0][0], *input_dim])
         self.upsampler = Upsampler(
             len(output_dim), hidden_dim[0][0], hidden_dim, output_channels,
             batchnorm=batchnorm, activation=activation,
             upsampling_mode=upsampling_mode)
-        self.activation_out = nn.Sigmoid() if sigmoid_out else lambda x: x
+        self.activation_out = nn.Sigmoid() if sigmoid_out else nn.Identity()
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """
@@ -255,7 +255,7 @@ class features_to_latent(nn.Module):
     """
     def __init__(self, input_dim: Tuple[int], latent_dim: int = 2) -> None:
         super(features_to_latent, self).__init__()
-        self.reshape_ = torch.prod(tt(input_dim))
+        self.reshape_ = torch.prod(torch.as_tensor(input_dim)).item()
         self.fc_latent = nn.Linear(self.reshape_, latent_dim)
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
@@ -270,7 +270,8 @@ class latent_to_features(nn.Module):
     def __init__(self, latent_dim: int, out_dim: Tuple[int]) -> None:
         super(latent_to_features, self).__init__()
         self.reshape_ = out_dim
-        self.fc = nn.Linear(latent_dim, torch.prod(tt(out_dim)).item())
+        self.fc = nn.Linear(
+            latent_dim, torch.prod(torch.as_tensor(out_dim)).item())
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         x = self.fc(x)
@@ -13,8 +13,6 @@ import torch.nn as nn
 
 from ..utils import get_activation, Concat
 
-tt = torch.tensor
-
 
 class fcEncoderNet(nn.Module):
     """
@@ -36,7 +34,7 @@ class fcEncoderNet(nn.Module):
         super(fcEncoderNet, self).__init__()
         if len(in_dim) not in [1, 2, 3]:
             raise ValueError("in_dim must be (h, w), (h, w, c), or (l,)")
-        self.in_dim = torch.prod(tt(in_dim)).item() + c_dim
+        self.in_dim = torch.prod(torch.as_tensor(in_dim)).item() + c_dim
         if hidden_dim is None:
             hidden_dim = [128, 128]
         self.flat = flat
@@ -46,7 +44,7 @@ class fcEncoderNet(nn.Module):
             self.in_dim, hidden_dim, activation)
         self.fc11 = nn.Linear(hidden_dim[-1], latent_dim)
         self.fc12 = nn.Linear(hidden_dim[-1], latent_dim)
-        self.activation_out = nn.Softplus() if softplus_out else lambda x: x
+        self.activation_out = nn.Softplus() if softplus_out else nn.Identity()
 
     def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor]:
         """
@@ -81,7 +79,7 @@ class jfcEncoderNet(nn.Module):
         super(jfcEncoderNet, self).__init__()
         if len(in_dim) not in [1, 2, 3]:
             raise ValueError("in_dim must be (h, w), (h, w, c), or (l,)")
-        self.in_dim = torch.prod(tt(in_dim)).item()
+        self.in_dim = torch.prod(torch.as_tensor(in_dim)).item()
         if hidden_dim is None:
             hidden_dim = [128, 128]
         self.flat = flat
@@ -92,7 +90,7 @@ class jfcEncoderNet(nn.Module):
         self.fc11 = nn.Linear(hidden_dim[-1], latent_dim)
         self.fc12 = nn.Linear(hidden_dim[-1], latent_dim)
         self.fc13 = nn.Linear(hidden_dim[-1], discrete_dim)
-        self.activation_out = nn.Softplus() if softplus_out else lambda x: x
+        self.activation_out = nn.Softplus() if softplus_out else nn.Identity()
 
     def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor]:
         """
@@ -130,7 +128,7 @@ class fcDecoderNet(nn.Module):
         self.unflat = unflat
         if self.unflat:
             self.reshape = out_dim
-        out_dim = torch.prod(tt(out_dim)).item()
+        out_dim = torch.prod(torch.as_tensor(out_dim)).item()
         if hidden_dim is None:
             hidden_dim = [128, 128]
 
@@ -138,7 +136,7 @@ class fcDecoderNet(nn.Module):
         self.fc_layers = make_fc_layers(
             latent_dim+c_dim, hidden_dim, activation)
         self.out = nn.Linear(hidden_dim[-1], out_dim)
-        self.activation_out = nn.Sigmoid() if sigmoid_out else lambda x: x
+        self.activation_out = nn.Sigmoid() if sigmoid_out else nn.Identity()
 
     def forward(self, z: torch.Tensor) -> torch.Tensor:
         """
@@ -184,7 +182,7 @@ class sDecoderNet(nn.Module):
         self.fc_layers = make_fc_layers(
             hidden_dim[0], hidden_dim, activation)
         self.out = nn.Linear(hidden_dim[-1], 1)  # need to generalize to multi-channel (c > 1)
-        self.activation_out = nn.Sigmoid() if sigmoid_out else lambda x: x
+        self.activation_out = nn.Sigmoid() if sigmoid_out else nn.Identity()
 
     def forward(self, x_coord: torch.Tensor, z: torch.Tensor) -> torch.Tensor:
         """
@@ -253,7 +251,7 @@ class fcClassifierNet(nn.Module):
         super(fcClassifierNet, self).__init__()
         if len(in_dim) not in [1, 2, 3]:
             raise ValueError("in_dim must be (h, w), (h, w, c), or (l,)")
-        self.in_dim = torch.prod(tt(in_dim)).item()
+        self.in_dim = torch.prod(torch.as_tensor(in_dim)).item()
         if hidden_dim is None:
             hidden_dim = [128, 128]
 
@@ -287,7 +285,7 @@ class fcRegressorNet(nn.Module):
         super(fcRegressorNet, self).__init__()
         if len(in_dim) not in [1, 2, 3]:
             raise ValueError("in_dim must be (h, w), (h, w, c), or (l,)")
-        self.in_dim = torch.prod(tt(in_dim)).item()
+        self.in_dim = torch.prod(torch.as_tensor(in_dim)).item()
         if hidden_dim is None:
             hidden_dim = [128, 128]
 
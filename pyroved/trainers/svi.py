@@ -1,4 +1,4 @@
-from typing import Type, Optional, Union
+from typing import Type, Optional, Union, Dict
 
 import torch
 import pyro
@@ -24,11 +24,18 @@ class SVItrainer:
             ELBO objective (Defaults to pyro.infer.Trace_ELBO)
         enumerate_parallel:
             Exact discrete enumeration for discrete latent variables
+        jit:
+            Compiles the ELBO objective with PyTorch JIT (uses
+            pyro.infer.JitTrace_ELBO or pyro.infer.JitTraceEnum_ELBO).
+            The model's model and guide are traced once and the compiled
+            graph is replayed at each step. Ignored when a custom loss is passed.
         seed:
             Enforces reproducibility
     
     Keyword Args:
         lr: learning rate (Default: 1e-3)
+        jit_options:
+            Dictionary with options passed to torch.jit.trace when jit=True
         device:
             Sets device to which model and data will be moved.
             Defaults to 'cuda:0' if a GPU is available and to CPU otherwise.
@@ -66,6 +73,7 @@ class SVItrainer:
                  optimizer: Type[optim.PyroOptim] = None,
                  loss: Type[infer.ELBO] = None,
                  enumerate_parallel: bool = False,
+                 jit: bool = False,
                  seed: int = 1,
                  **kwargs: Union[str, float]
                  ) -> None:
@@ -80,11 +88,8 @@ class SVItrainer:
             lr = kwargs.get("lr", 1e-3)
             optimizer = optim.Adam({"lr": lr})
         if loss is None:
-            if enumerate_parallel:
-                loss = infer.TraceEnum_ELBO(
-                    max_plate_nesting=1, strict_enumeration_warning=False)
-            else:
-                loss = infer.Trace_ELBO()
+            loss = self._get_elbo(
+                enumerate_parallel, jit, kwargs.get("jit_options"))
         guide = model.guide
         if enumerate_parallel:
             guide = infer.config_enumerate(guide, "parallel", expand=True)   
@@ -92,6 +97,22 @@ class SVItrainer:
         self.loss_history = {"training_loss": [], "test_loss": []}
         self.current_epoch = 0
 
+    @staticmethod
+    def _get_elbo(enumerate_parallel: bool = False,
+                  jit: bool = False,
+                  jit_options: Optional[Dict[str, bool]] = None
+                  ) -> Type[infer.ELBO]:
+        """
+        Returns (JIT-compiled) ELBO objective
+        """
+        jit_kw = dict(ignore_jit_warnings=True, jit_options=jit_options) if jit else {}
+        if enumerate_parallel:
+            elbo = infer.JitTraceEnum_ELBO if jit else infer.TraceEnum_ELBO
+            return elbo(max_plate_nesting=1, strict_enumeration_warning=False,
+                        **jit_kw)
+        elbo = infer.JitTrace_ELBO if jit else infer.Trace_ELBO
+        return elbo(**jit_kw)
+
     def train(self,
               train_loader: Type[torch.utils.data.DataLoader],
               **kwargs: float) -> float:
@@ -1,5 +1,5 @@
 """Utility functions"""
-from .coord import (generate_grid, generate_latent_grid,
+from .coord import (affine_grid_coordinates, generate_grid, generate_latent_grid,
                     generate_latent_grid_traversal, transform_coordinates)
 from .data import init_dataloader, init_ssvae_dataloaders
 from .nn import (get_activation, get_bnorm, get_conv, get_maxpool,
@@ -9,6 +9,7 @@ from .prob import get_sampler
 from .viz import plot_grid_traversal, plot_img_grid, plot_spect_grid
 
 __all__ = ['generate_grid', 'transform_coordinates', 'generate_latent_grid',
+           'affine_grid_coordinates',
            'get_sampler', 'init_dataloader', 'init_ssvae_dataloaders',
            'get_activation', 'get_bnorm', 'get_conv', 'get_maxpool',
            'to_onehot', 'set_deterministic_mode', 'get_sampler',
@@ -1,7 +1,7 @@
-from typing import Union, Tuple
+from typing import Optional, Union, Tuple
 import torch
+import torch.nn.functional as F
 import pyro.distributions as dist
-tt = torch.tensor
 
 
 def grid2xy(X1: torch.Tensor, X2: torch.Tensor) -> torch.Tensor:
@@ -45,47 +45,84 @@ def generate_grid(data_dim: Tuple[int]) -> torch.Tensor:
 
 
 def transform_coordinates(coord: torch.Tensor,
-                          phi: Union[torch.Tensor, float] = 0,
-                          coord_dx: Union[torch.Tensor, float] = 0,
-                          scale: Union[torch.Tensor, float] = 1.,
+                          phi: Optional[Union[torch.Tensor, float]] = None,
+                          coord_dx: Optional[Union[torch.Tensor, float]] = None,
+                          scale: Optional[Union[torch.Tensor, float]] = None,
                           ) -> torch.Tensor:
     """
     Rotation of 2D coordinates followed by scaling and translation.
-    For 1D grid, there is only transaltion. Operates on batches.
+    For 1D grid, there is only transaltion. Operates on batches of grids
+    or on a single (unbatched) grid, which is then broadcast over a batch of
+    transformations (phi and scale must be 1D tensors in this case).
+    Transformations passed as None are skipped.
     """
-    if coord.shape[-1] == 1:
-        return coord + coord_dx
-    coord = rotate_coordinates(coord, phi)
-    coord = scale_coordinates(coord, scale)
-    return coord + coord_dx
+    if coord.shape[-1] != 1 and (phi is not None or scale is not None):
+        # Rotation and scaling are combined into one 2x2 matrix per sample
+        # and applied to all the coordinates with a single matmul
+        if coord.ndim > 2:
+            batch_dim = coord.shape[0]
+        else:
+            batch_dim = len(phi if phi is not None else scale)
+        linear = linear_transform_matrix(
+            batch_dim, phi, scale, dtype=coord.dtype, device=coord.device)
+        coord = torch.matmul(coord, linear)
+    if coord_dx is not None:
+        coord = coord + coord_dx
+    return coord
 
 
-def rotate_coordinates(coord: torch.Tensor,
-                       phi: Union[torch.Tensor, float] = 0
-                       ) -> torch.Tensor:
+def linear_transform_matrix(batch_dim: int,
+                            phi: Optional[Union[torch.Tensor, float]] = None,
+                            scale: Optional[Union[torch.Tensor, float]] = None,
+                            dtype: Optional[torch.dtype] = None,
+                            device: Optional[torch.device] = None
+                            ) -> torch.Tensor:
     """
-    Rotation of 2D coordinates. Operates on batches
+    Batch of 2x2 matrices for rotation followed by scaling of 2D coordinates
+    (multiplied from the right). Single angle/scale values are broadcast
+    over the batch
     """
-    if torch.sum(phi) == 0:
-        phi = coord.new_zeros(coord.shape[0])
-    rotmat_r1 = torch.stack([torch.cos(phi), torch.sin(phi)], 1)
-    rotmat_r2 = torch.stack([-torch.sin(phi), torch.cos(phi)], 1)
-    rotmat = torch.stack([rotmat_r1, rotmat_r2], axis=1)
-    coord = torch.bmm(coord, rotmat)
-    return coord
-
-
-def scale_coordinates(coord: torch.Tensor,
-                      scale: torch.Tensor
-                      ) -> torch.Tensor:
+    specs = dict(dtype=dtype, device=device)
+    if phi is None:
+        linear = torch.eye(2, **specs).expand(batch_dim, 2, 2)
+    else:
+        phi = torch.as_tensor(phi, **specs).expand(batch_dim)
+        cos, sin = torch.cos(phi), torch.sin(phi)
+        linear = torch.stack([torch.stack([cos, sin], 1),
+                              torch.stack([-sin, cos], 1)], 1)
+    if scale is not None:
+        linear = linear * torch.as_tensor(scale, **specs).reshape(-1, 1, 1)
+    return linear
+
+
+def affine_grid_coordinates(im_dim: Tuple[int],
+                            batch_dim: int,
+                            phi: Optional[torch.Tensor] = None,
+                            coord_dx: Optional[torch.Tensor] = None,
+                            scale: Optional[torch.Tensor] = None,
+                            ) -> torch.Tensor:
     """
-    Scaling of 2D coordinates. Operates on batches
+    Generates a batch of 2D coordinate grids (in the same layout as
+    generate_grid) with rotation, scaling and translation applied.
+    The transformations are combined into per-sample 2x3 affine matrices,
+    and the grids are produced by PyTorch's affine grid generator, i.e. with
+    a single batched matrix multiplication. Equivalent to
+    transform_coordinates(generate_grid(im_dim).expand(batch_dim, -1, -1), ...)
     """
-    scalemat = coord.new_zeros(coord.shape[0], 2, 2)
-    scalemat[:, 0, 0] = scale
-    scalemat[:, 1, 1] = scale
-    coord = torch.bmm(coord, scalemat)
-    return coord
+    ref = next(t for t in (phi, coord_dx, scale) if t is not None)
+    linear = linear_transform_matrix(
+        batch_dim, phi, scale, dtype=ref.dtype, device=ref.device)
+    # The generate_grid coordinates are (y, -x) in terms of the affine_grid's
+    # normalized (x, y) coordinates, so the rows of the matrix are swapped
+    # (with a sign change) and the result is transposed to act on columns
+    linear = torch.stack([-linear[:, 1], linear[:, 0]], 1).transpose(1, 2)
+    if coord_dx is None:
+        theta = F.pad(linear, (0, 1))
+    else:
+        theta = torch.cat([linear, coord_dx.reshape(-1, 2, 1)], -1)
+    coord = F.affine_grid(
+        theta, (batch_dim, 1, *im_dim), align_corners=True)
+    return coord.reshape(batch_dim, -1, 2)
 
 
 def generate_latent_grid(d: int, **kwargs) -> torch.Tensor:
@@ -102,11 +139,8 @@ def generate_latent_grid(d: int, **kwargs) -> torch.Tensor:
     else:
         grid_x = dist.Normal(0, 1).icdf(torch.linspace(0.95, 0.05, d[0]))
         grid_y = dist.Normal(0, 1).icdf(torch.linspace(0.05, 0.95, d[1]))
-    z = []
-    for xi in grid_x:
-        for yi in grid_y:
-            z.append(tt([xi, yi]).float().unsqueeze(0))
-    return torch.cat(z), (grid_x, grid_y)
+    z = torch.stack(torch.meshgrid(grid_x, grid_y, indexing='ij'), -1)
+    return z.reshape(-1, 2).float(), (grid_x, grid_y)
 
 
 def generate_latent_grid_traversal(d: int, cont_dim: int, disc_dim,
@@ -118,16 +152,9 @@ def generate_latent_grid_traversal(d: int, cont_dim: int, disc_dim,
     # Get continuous latent coordinates
     samples_cont = torch.zeros(size=(num_samples, cont_dim)) + cont_idx_fixed
     cont_traversal = dist.Normal(0, 1).icdf(torch.linspace(0.95, 0.05, d))
-    for i in range(d):
-        for j in range(d):
-            samples_cont[i * d + j, cont_idx] = cont_traversal[j]
+    samples_cont[:, cont_idx] = cont_traversal.repeat(d)
     # Get discrete latent coordinates
     n = torch.arange(0, disc_dim)
     n = n.tile(d // disc_dim + 1)[:d]
-    samples_disc = []
-    for i in range(d):
-        samples_disc_i = torch.zeros((d, disc_dim))
-        samples_disc_i[:, n[i]] = 1
-        samples_disc.append(samples_disc_i)
-    samples_disc = torch.cat(samples_disc)
+    samples_disc = torch.eye(disc_dim)[n].repeat_interleave(d, dim=0)
     return samples_cont, samples_disc
@@ -8,7 +8,10 @@ def get_sampler(
     """Gets a sampler for VAE's decoder.
 
     Args:
-        sampler: 'bernoulli', 'continuous_bernoulli', 'gaussian'
+        sampler: 'bernoulli', 'bernoulli_logits', 'continuous_bernoulli', 'gaussian'.
+            The 'bernoulli_logits' sampler expects the decoder to output logits
+            (i.e. no sigmoid activation) and scores them with the fused,
+            numerically stable binary cross-entropy with logits.
 
     Keyword Args:
         decoder_sig:
@@ -24,6 +27,7 @@ def get_sampler(
 
     samplers = {
         "bernoulli": lambda x: dist.Bernoulli(x, validate_args=False),
+        "bernoulli_logits": lambda x: dist.Bernoulli(logits=x, validate_args=False),
         "continuous_bernoulli": lambda x: dist.ContinuousBernoulli(x),
         "gaussian": lambda x: dist.Normal(x, kwargs.get("decoder_sig", 0.5))
         }
@@ -2,6 +2,7 @@ import sys
 from copy import deepcopy as dc
 
 import torch
+import torch.nn.functional as F
 import pyro
 import pyro.poutine as poutine
 import pyro.distributions as dist
@@ -13,7 +14,7 @@ from numpy import array_equal
 
 sys.path.append("../../")
 
-from pyroved import models, nets, utils
+from pyroved import models, nets, utils, trainers
 
 tt = torch.tensor
 
@@ -97,6 +98,62 @@ def test_base_vae_split_latent_2d():
     assert_(z_split[3].shape, (5, 1))
 
 
+def test_base_vae_split_latent_2d_none():
+    z = torch.randn(5, 3)
+    m = models.base.baseVAE((8, 8), ['r'])
+    phi, dx, sc, z = m._split_latent(z)
+    assert_(dx is None)
+    assert_(sc is None)
+    assert_equal(phi.shape, (5,))
+    assert_equal(z.shape, (5, 2))
+
+
+@pytest.mark.parametrize("data_dim", [(8,), (8, 8)])
+def test_base_vae_buffers(data_dim):
+    m = models.base.baseVAE(data_dim, ['t'])
+    buffers = dict(m.named_buffers())
+    assert_("grid" in buffers and "t_prior" in buffers)
+    assert_(len(m.state_dict()) == 0)
+    m.to(torch.float64)
+    assert_(m.grid.dtype == torch.float64)
+
+
+@pytest.mark.parametrize("invariances", [['r'], ['t'], ['s'], ['r', 't', 's']])
+def test_affine_grid_coordinates(invariances):
+    data_dim = (8, 6)
+    z = torch.randn(3, 4)
+    m = models.base.baseVAE(data_dim, invariances)
+    phi, dx, sc, _ = m._split_latent(z)
+    grid = m.grid.expand(3, -1, -1)
+    expected = utils.transform_coordinates(
+        grid, phi, None if dx is None else dx.unsqueeze(1), sc)
+    actual = utils.affine_grid_coordinates(data_dim, 3, phi, dx, sc)
+    assert_(torch.allclose(actual, expected, atol=1e-6))
+
+
+@pytest.mark.parametrize("invariances", [['r'], ['t'], ['s'], ['r', 't', 's']])
+def test_transform_coordinates_2d(invariances):
+    z = torch.randn(3, 4)
+    m = models.base.baseVAE((8, 6), invariances)
+    phi, dx, sc, _ = m._split_latent(z)
+    grid = m.grid.expand(3, -1, -1)
+    expected = grid
+    if phi is not None:
+        cos, sin = torch.cos(phi)[:, None], torch.sin(phi)[:, None]
+        x, y = expected[..., 0], expected[..., 1]
+        expected = torch.stack([x * cos - y * sin, x * sin + y * cos], -1)
+    if sc is not None:
+        expected = expected * sc[:, None, None]
+    if dx is not None:
+        dx = dx.unsqueeze(1)
+        expected = expected + dx
+    actual = utils.transform_coordinates(grid, phi, dx, sc)
+    assert_(torch.allclose(actual, expected, atol=1e-6))
+    # A single grid is broadcast over the batch of transformations
+    actual = utils.transform_coordinates(m.grid, phi, dx, sc)
+    assert_(torch.allclose(actual, expected, atol=1e-6))
+
+
 @pytest.mark.parametrize("invariances", [None, ['r'], ['s'], ['r', 't', 's'], ['s', 'r', 't']])
 def test_trvae_sites_dims_2d(invariances):
     data_dim = (3, 8, 8)
@@ -142,6 +199,22 @@ def test_trvae_sites_fn(data_dim, invariances):
     assert_(isinstance(model_trace.nodes["obs"]['fn'].base_dist, dist.Bernoulli))
 
 
+def test_trvae_compile_unsupported(monkeypatch):
+    monkeypatch.delattr(torch.nn.Module, "compile")
+    with pytest.raises(RuntimeError, match="PyTorch 2.2"):
+        models.iVAE((8, 8), invariances=['r'], compile=True)
+
+
+def test_trvae_default_scale_factor():
+    x = torch.randn(3, 8, 8)
+    model = models.iVAE((8, 8), invariances=['r'], scale_factor=2.)
+    guide_trace, model_trace = get_traces(model, x)
+    assert_equal(guide_trace.nodes["latent"]["scale"], 2.)
+    assert_equal(model_trace.nodes["latent"]["scale"], 2.)
+    guide_trace = pyro.poutine.trace(model.guide).get_trace(x, scale_factor=3.)
+    assert_equal(guide_trace.nodes["latent"]["scale"], 3.)
+
+
 @pytest.mark.parametrize("input_dim, output_dim",
                          [((8,), (8, 8)), ((8, 8), (8,)),
                           ((8,), (8,)), ((8, 8), (8, 8))])
@@ -373,6 +446,30 @@ def test_ssregvae_reg_sites_fn(invariances):
     assert_(isinstance(guide_trace.nodes["y"]['fn'].base_dist, dist.Normal))
 
 
+def test_trvae_set_decoder_logits():
+    data_dim = (8, 8)
+    model = models.iVAE(data_dim, invariances=['r', 't'])
+    z_coord = torch.randn(3, 2)
+    decoded = model.decode(z_coord)
+    # Re-setting the model's own (logits) decoder keeps the fused likelihood
+    model.set_decoder(model.decoder)
+    assert_(model._logits_d)
+    assert_(torch.allclose(decoded, model.decode(z_coord)))
+    # Decoders with a sigmoid output are treated as outputting probabilities
+    model.set_decoder(nets.sDecoderNet(data_dim, 2, sigmoid_out=True))
+    assert_(not model._logits_d)
+    x = torch.rand(2, *data_dim)
+    _, model_trace = get_traces(model, x)
+    obs_fn = model_trace.nodes["obs"]['fn'].base_dist
+    z = model_trace.nodes["latent"]["value"]
+    probs = model.decoder(*model._coord_branch(z, len(x))).reshape(len(x), -1)
+    x_flat = x.reshape(len(x), -1)
+    expected = -F.binary_cross_entropy(probs, x_flat, reduction='none')
+    assert_(torch.allclose(obs_fn.log_prob(x_flat), expected, atol=1e-5))
+    decoded = model.decode(z_coord)
+    assert_(decoded.min() >= 0 and decoded.max() <= 1)
+
+
 @pytest.mark.parametrize(
     "sampler, expected_dist",
     [("gaussian", dist.Normal), ("bernoulli", dist.Bernoulli),
@@ -385,6 +482,25 @@ def test_trvae_decoder_sampler(sampler, expected_dist):
     assert_(isinstance(model_trace.nodes["obs"]['fn'].base_dist, expected_dist))
 
 
+@pytest.mark.parametrize("invariances", [None, ['r', 't']])
+def test_trvae_bernoulli_logits(invariances):
+    data_dim = (2, 8, 8)
+    x = torch.rand(*data_dim)
+    model = models.iVAE(data_dim[1:], invariances=invariances)
+    _, model_trace = get_traces(model, x)
+    obs_fn = model_trace.nodes["obs"]['fn'].base_dist
+    # The decoder outputs logits, which are scored with the fused BCE
+    z = model_trace.nodes["latent"]["value"]
+    dec_args = model._coord_branch(z, len(x)) if model.coord > 0 else (z,)
+    logits = model.decoder(*dec_args).reshape(len(x), -1)
+    x_flat = x.reshape(len(x), -1)
+    expected = -F.binary_cross_entropy_with_logits(
+        logits, x_flat, reduction='none')
+    assert_(torch.allclose(obs_fn.log_prob(x_flat), expected, atol=1e-6))
+    decoded = model.decode(torch.randn(3, 2))
+    assert_(decoded.min() >= 0 and decoded.max() <= 1)
+
+
 @pytest.mark.parametrize(
     "sampler, expected_dist",
     [("gaussian", dist.Normal), ("bernoulli", dist.Bernoulli),
@@ -430,8 +546,8 @@ def test_basevae_encode_x(data_dim):
     encoder_net = nets.fcEncoderNet(data_dim[1:], 2, 0)
     vae.set_encoder(encoder_net)
     encoded = vae._encode(x)
-    assert_equal(encoded[:, :2].shape, (data_dim[0], 2))
-    assert_equal(encoded[:, 2:].shape, (data_dim[0], 2))
+    assert_equal(encoded[0].shape, (data_dim[0], 2))
+    assert_equal(encoded[1].shape, (data_dim[0], 2))
 
 
 def test_basevae_encode_xy():
@@ -443,8 +559,8 @@ def test_basevae_encode_xy():
     encoder_net = nets.fcEncoderNet(data_dim[1:], 2, 3)
     vae.set_encoder(encoder_net)
     encoded = vae._encode(x, y)
-    assert_equal(encoded[:, :2].shape, (data_dim[0], 2))
-    assert_equal(encoded[:, 2:].shape, (data_dim[0], 2))
+    assert_equal(encoded[0].shape, (data_dim[0], 2))
+    assert_equal(encoded[1].shape, (data_dim[0], 2))
 
 
 @pytest.mark.parametrize("invariances", [None, ['r'], ['s'], ['r', 't', 's']])
@@ -486,6 +602,59 @@ def test_trvae_decode_2d(invariances):
     assert_equal(decoded.squeeze().shape, data_dim)
 
 
+@pytest.mark.parametrize("batch_size", [2, 100])
+def test_trvae_decode_transform(batch_size):
+    data_dim = (8, 8)
+    model = models.iVAE(data_dim, invariances=['r', 't'])
+    z_coord = torch.randn(5, 2)
+    decoded = model.decode(
+        z_coord, angle=0.5, shift=tt([0.1, -0.1]), batch_size=batch_size)
+    assert_equal(decoded.shape, (5, *data_dim))
+
+
+def test_trvae_freeze_decoder():
+    data_dim = (8, 8)
+    model = models.iVAE(data_dim, invariances=['r', 't'])
+    z_coord = torch.randn(5, 2)
+    decoded = model.decode(z_coord)
+    state_dict_keys = model.state_dict().keys()
+    model.freeze_decoder()
+    assert_(torch.allclose(decoded, model.decode(z_coord), atol=1e-6))
+    assert_equal(model.state_dict().keys(), state_dict_keys)
+    model.set_decoder(model.decoder)
+    assert_(model._frozen_decoder is None)
+
+
+def test_trvae_freeze_decoder_script_fallback(monkeypatch):
+    # Older PyTorch versions (without nn.Module.compile) use TorchScript
+    monkeypatch.delattr(torch.nn.Module, "compile")
+    model = models.iVAE((8, 8), invariances=['r', 't'])
+    z_coord = torch.randn(5, 2)
+    decoded = model.decode(z_coord)
+    with pytest.warns(UserWarning, match="could not be scripted"):
+        model.freeze_decoder()
+    assert_(torch.allclose(decoded, model.decode(z_coord), atol=1e-6))
+
+
+def test_trvae_freeze_decoder_training():
+    data_dim = (8, 8)
+    model = models.iVAE(data_dim, invariances=['r', 't'])
+    z_coord = torch.randn(5, 2)
+    model.freeze_decoder()
+    decoded_frozen = model.decode(z_coord)
+    train_loader = utils.init_dataloader(torch.rand(6, *data_dim), batch_size=3)
+    trainer = trainers.SVItrainer(model)
+    for _ in range(3):
+        trainer.step(train_loader)
+    # The stale frozen copy is discarded with a warning
+    with pytest.warns(UserWarning, match="freeze_decoder"):
+        decoded = model.decode(z_coord)
+    assert_(model._frozen_decoder is None)
+    assert_(not torch.allclose(decoded, decoded_frozen))
+    model.freeze_decoder()
+    assert_(torch.allclose(decoded, model.decode(z_coord), atol=1e-6))
+
+
 @pytest.mark.parametrize("invariances", [None, ['t']])
 def test_trvae_decode_1d(invariances):
     data_dim = (8,)
@@ -551,6 +720,24 @@ def test_trvae_encode_1d(invariances):
     assert_equal(encoded[0].shape, encoded[1].shape)
 
 
+@pytest.mark.parametrize("batch_size", [2, 100])
+def test_trvae_encode_regular_tensors(batch_size):
+    x = torch.randn(3, 8, 8)
+    model = models.iVAE((8, 8), 2, invariances=['r', 't'])
+    z_loc, z_scale = model.encode(x, batch_size=batch_size)
+    assert_(not z_loc.is_inference())
+    assert_(not z_scale.is_inference())
+    # Outputs can be modified in place and used in downstream training
+    z_loc[:, 0] = 0
+    torch.nn.Linear(z_loc.shape[1], 1)(z_loc).sum().backward()
+
+
+def test_ved_manifold2d_regular_tensors():
+    model = models.VED((8, 8), (8, 8))
+    decoded_grid = model.manifold2d(2, plot=False)
+    assert_(not decoded_grid.is_inference())
+
+
 @pytest.mark.parametrize("input_dim, output_dim",
                          [((8,), (8, 8)), ((8, 8), (8,)),
                           ((8,), (8,)), ((8, 8), (8, 8))])
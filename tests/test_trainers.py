@@ -40,6 +40,59 @@ def test_svi_trainer_trvae(invariances):
     assert_(not assert_weights_equal(weights_before, weights_after))
 
 
+@pytest.mark.parametrize("invariances", [None, ['r'], ['s'], ['t'], ['r', 't', 's']])
+def test_svi_trainer_trvae_jit(invariances):
+    data_dim = (5, 8, 8)
+    train_data = torch.randn(*data_dim)
+    train_loader = utils.init_dataloader(train_data, batch_size=5)
+    vae = models.iVAE(data_dim[1:], 2, invariances)
+    trainer = trainers.SVItrainer(vae, jit=True)
+    weights_before = dc(vae.state_dict())
+    for _ in range(2):
+        trainer.step(train_loader)
+    weights_after = vae.state_dict()
+    assert_(not torch.isnan(tt(trainer.loss_history["training_loss"])).any())
+    assert_(not assert_weights_equal(weights_before, weights_after))
+
+
+@pytest.mark.parametrize("invariances", [None, ['r', 't']])
+def test_svi_trainer_trvae_autocast(invariances):
+    data_dim = (5, 8, 8)
+    train_data = torch.rand(*data_dim)
+    train_loader = utils.init_dataloader(train_data, batch_size=2)
+    vae = models.iVAE(data_dim[1:], 2, invariances, autocast=True)
+    trainer = trainers.SVItrainer(vae)
+    weights_before = dc(vae.state_dict())
+    for _ in range(2):
+        trainer.step(train_loader)
+    weights_after = vae.state_dict()
+    assert_(not torch.isnan(tt(trainer.loss_history["training_loss"])).any())
+    assert_(not assert_weights_equal(weights_before, weights_after))
+
+
+@pytest.mark.skipif(not hasattr(torch.nn.Module, "compile"),
+                    reason="requires PyTorch>=2.2")
+@pytest.mark.parametrize("invariances", [None, ['t'], ['r', 't', 's']])
+def test_svi_trainer_trvae_compile(invariances):
+    data_dim = (4, 8, 8)
+    train_data = torch.rand(*data_dim)
+    train_loader = utils.init_dataloader(train_data, batch_size=2)
+    vae = models.iVAE(data_dim[1:], 2, invariances, compile=True)
+    trainer = trainers.SVItrainer(vae)
+    weights_before = dc(vae.state_dict())
+    for _ in range(2):
+        trainer.step(train_loader)
+    weights_after = vae.state_dict()
+    assert_(not torch.isnan(tt(trainer.loss_history["training_loss"])).any())
+    assert_(not assert_weights_equal(weights_before, weights_after))
+    # Parameter names are not changed by the in-place compilation
+    assert_(weights_before.keys() == weights_after.keys())
+    z_loc, z_scale = vae.encode(train_data)
+    assert_(z_loc.shape == z_scale.shape == (data_dim[0], vae.z_dim))
+    decoded = vae.decode(torch.randn(3, 2))
+    assert_(decoded.shape == (3, *data_dim[1:]))
+
+
 @pytest.mark.parametrize("invariances", [None, ['r'], ['s'], ['t'], ['r', 't', 's']])
 def test_svi_trainer_jtrvae(invariances):
     data_dim = (6, 8, 8)